@@ -14,14 +14,31 @@ import os
 import base64
 import hashlib
 import logging
+import functools
+import threading
 from typing import Optional, Dict, List
 from datetime import datetime
 
 from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.storage import DatabaseManager, SystemSetting
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=8)
+def _derive_key(db_path: str) -> bytes:
+    """
+    基于数据库路径派生 Fernet 密钥
+    
+    PBKDF2 10 万轮迭代开销较大，按路径缓存结果，避免重复初始化时重新计算
+    """
+    key = hashlib.pbkdf2_hmac('sha256', b'stock-analysis-secret', db_path.encode(), 100000)
+    return base64.urlsafe_b64encode(key)
+
+
 class ConfigStore:
     """
     配置存储服务
@@ -49,11 +66,17 @@ class ConfigStore:
     _instance: Optional['ConfigStore'] = None
     _fernet: Optional[Fernet] = None
     
+    # 单例创建锁（保证并发构造时只派生一次密钥）
+    _lock = threading.RLock()
+    
     def __new__(cls, *args, **kwargs):
-        """单例模式"""
+        """单例模式（双重检查锁定，线程安全）"""
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
     
     def __init__(self, db_path: Optional[str] = None):
@@ -66,42 +89,59 @@ class ConfigStore:
         if self._initialized:
             return
         
-        self._db_path = db_path or os.getenv('DATABASE_PATH', './data/stock_analysis.db')
-        self._init_encryption()
-        self._initialized = True
+        with self._lock:
+            # 并发构造时只由一个线程执行初始化（含 PBKDF2 密钥派生）
+            if self._initialized:
+                return
+            
+            self._db_path = db_path or os.getenv('DATABASE_PATH', './data/stock_analysis.db')
+            self._init_encryption()
+            self._initialized = True
     
     @classmethod
     def get_instance(cls) -> 'ConfigStore':
         """获取单例实例"""
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
+        instance = cls._instance
+        if instance is None or not instance._initialized:
+            # cls() 在初始化完成前会阻塞在锁上，不会返回半初始化的实例
+            instance = cls()
+        return instance
     
     @classmethod
     def reset_instance(cls) -> None:
         """重置单例（用于测试）"""
-        cls._instance = None
-        cls._fernet = None
+        with cls._lock:
+            cls._instance = None
+            cls._fernet = None
     
     def _init_encryption(self) -> None:
         """初始化加密器"""
         try:
             key = self._get_encryption_key()
+            # Fernet 实例在单例上复用，避免每次加解密重复创建上下文
             self._fernet = Fernet(key)
             logger.debug("加密器初始化成功")
+            self._log_crypto_backend()
         except Exception as e:
             logger.warning(f"加密器初始化失败，将使用明文存储: {e}")
             self._fernet = None
     
+    @staticmethod
+    def _log_crypto_backend() -> None:
+        """记录 cryptography 使用的 OpenSSL 版本（确认走 EVP/AES-NI 路径）"""
+        try:
+            from cryptography.hazmat.backends.openssl.backend import backend
+            logger.info(f"加密后端: {backend.openssl_version_text()}")
+        except Exception as e:
+            logger.debug(f"无法获取 OpenSSL 版本信息: {e}")
+    
     def _get_encryption_key(self) -> bytes:
         """
         生成加密密钥
         
         基于数据库路径生成固定密钥，确保重启后可解密
         """
-        salt = self._db_path.encode()
-        key = hashlib.pbkdf2_hmac('sha256', b'stock-analysis-secret', salt, 100000)
-        return base64.urlsafe_b64encode(key)
+        return _derive_key(self._db_path)
     
     def _encrypt(self, value: str) -> str:
         """加密敏感值"""
@@ -109,7 +149,7 @@ class ConfigStore:
             return value
         try:
             encrypted = self._fernet.encrypt(value.encode())
-            return encrypted.decode()
+            return encrypted.decode('ascii')
         except Exception as e:
             logger.warning(f"加密失败: {e}")
             return value
@@ -119,7 +159,8 @@ class ConfigStore:
         if not value or not self._fernet:
             return value
         try:
-            decrypted = self._fernet.decrypt(value.encode())
+            # Fernet 令牌为 URL-safe base64 文本，可直接传入 str，省去一次编码
+            decrypted = self._fernet.decrypt(value)
             return decrypted.decode()
         except InvalidToken:
             logger.warning("解密失败：密钥不匹配或数据损坏")
@@ -128,9 +169,20 @@ class ConfigStore:
             logger.warning(f"解密失败: {e}")
             return value
     
+    def _is_same_value(self, setting, value: str, is_sensitive: bool) -> bool:
+        """
+        判断已存储的配置值是否与新值相同
+        
+        Fernet 每次加密使用随机 IV，密文必然不同，因此敏感值需解密后比较明文
+        """
+        if bool(setting.is_encrypted) != is_sensitive:
+            return False
+        if setting.is_encrypted:
+            return bool(setting.value) and self._decrypt(setting.value) == value
+        return setting.value == value
+    
     def _get_session(self):
         """获取数据库 Session"""
-        from src.storage import DatabaseManager
         return DatabaseManager.get_instance().get_session()
     
     def get(self, key: str) -> Optional[str]:
@@ -143,9 +195,6 @@ class ConfigStore:
         Returns:
             配置值，不存在返回 None
         """
-        from src.storage import SystemSetting
-        from sqlalchemy import select
-        
         try:
             with self._get_session() as session:
                 result = session.execute(
@@ -174,25 +223,22 @@ class ConfigStore:
         Returns:
             配置字典 {key: value}
         """
-        from src.storage import SystemSetting
-        from sqlalchemy import select
-        
         try:
+            # 先取出全部行并释放 Session，再在会话外解密
             with self._get_session() as session:
                 query = select(SystemSetting)
                 if category:
                     query = query.where(SystemSetting.category == category)
                 
-                results = session.execute(query).scalars().all()
-                
-                configs = {}
-                for setting in results:
-                    value = setting.value
-                    if setting.is_encrypted and value:
-                        value = self._decrypt(value)
-                    configs[setting.key] = value
-                
-                return configs
+                rows = [
+                    (setting.key, setting.value, bool(setting.is_encrypted and setting.value))
+                    for setting in session.execute(query).scalars().all()
+                ]
+            
+            return {
+                key: self._decrypt(value) if encrypted else value
+                for key, value, encrypted in rows
+            }
         except Exception as e:
             logger.error(f"获取所有配置失败: {e}")
             return {}
@@ -210,37 +256,46 @@ class ConfigStore:
         Returns:
             是否成功
         """
-        from src.storage import SystemSetting
-        from sqlalchemy import select
-        
         # 空值删除配置
         if value is None or value == '':
             return self.delete(key)
         
         try:
             is_sensitive = key in self.SENSITIVE_KEYS
-            stored_value = self._encrypt(value) if is_sensitive else value
             
             with self._get_session() as session:
                 existing = session.execute(
                     select(SystemSetting).where(SystemSetting.key == key)
                 ).scalar_one_or_none()
                 
-                if existing:
-                    existing.value = stored_value
-                    existing.is_encrypted = 1 if is_sensitive else 0
-                    existing.category = category
-                    existing.description = description
-                    existing.updated_at = datetime.now()
-                else:
-                    setting = SystemSetting(
-                        key=key,
-                        value=stored_value,
-                        is_encrypted=1 if is_sensitive else 0,
-                        category=category,
-                        description=description,
-                    )
-                    session.add(setting)
+                # 值与元数据均未变化时跳过写入
+                if (existing is not None
+                        and existing.category == category
+                        and existing.description == description
+                        and self._is_same_value(existing, value, is_sensitive)):
+                    logger.debug(f"配置 {key} 未变化，跳过保存")
+                    return True
+                
+                # 单条 UPSERT，避免并发写入时 SELECT 与 INSERT 之间的竞争
+                stmt = sqlite_insert(SystemSetting).values(
+                    key=key,
+                    value=self._encrypt(value) if is_sensitive else value,
+                    is_encrypted=1 if is_sensitive else 0,
+                    category=category,
+                    description=description,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[SystemSetting.key],
+                    set_=dict(
+                        value=stmt.excluded.value,
+                        is_encrypted=stmt.excluded.is_encrypted,
+                        category=stmt.excluded.category,
+                        description=stmt.excluded.description,
+                        # ON CONFLICT 更新不会触发 onupdate，需显式设置
+                        updated_at=datetime.now(),
+                    ),
+                )
+                session.execute(stmt)
                 
                 session.commit()
                 logger.debug(f"配置 {key} 已保存")
@@ -254,18 +309,72 @@ class ConfigStore:
         """
         批量设置配置
         
+        在单个事务中完成：一次查询已有记录，原地更新/批量插入/删除，一次提交。
+        
         Args:
-            configs: 配置字典 {key: value}
+            configs: 配置字典 {key: value}，None 或空字符串将删除配置
             category: 分类
             
         Returns:
             是否全部成功
         """
-        success = True
-        for key, value in configs.items():
-            if not self.set(key, value, category):
-                success = False
-        return success
+        if not configs:
+            return True
+        
+        try:
+            with self._get_session() as session:
+                existing = {
+                    row.key: row
+                    for row in session.execute(
+                        select(SystemSetting).where(SystemSetting.key.in_(list(configs)))
+                    ).scalars()
+                }
+                
+                new_rows = []
+                deleted_keys = []
+                changed = False
+                for key, value in configs.items():
+                    row = existing.get(key)
+                    # 空值删除配置
+                    if value is None or value == '':
+                        if row is not None:
+                            deleted_keys.append(key)
+                            changed = True
+                        continue
+                    
+                    is_sensitive = key in self.SENSITIVE_KEYS
+                    if row is not None:
+                        # 未变化的配置不重新加密，避免无意义的写入
+                        if row.category == category and self._is_same_value(row, value, is_sensitive):
+                            continue
+                        row.value = self._encrypt(value) if is_sensitive else value
+                        row.is_encrypted = 1 if is_sensitive else 0
+                        row.category = category
+                    else:
+                        new_rows.append(SystemSetting(
+                            key=key,
+                            value=self._encrypt(value) if is_sensitive else value,
+                            is_encrypted=1 if is_sensitive else 0,
+                            category=category,
+                        ))
+                    changed = True
+                
+                if not changed:
+                    logger.debug("批量配置未变化，跳过保存")
+                    return True
+                
+                if deleted_keys:
+                    session.execute(
+                        delete(SystemSetting).where(SystemSetting.key.in_(deleted_keys))
+                    )
+                session.add_all(new_rows)
+                session.commit()
+                logger.debug(f"批量保存配置 {len(configs)} 项")
+                return True
+                
+        except Exception as e:
+            logger.error(f"批量保存配置失败: {e}")
+            return False
     
     def delete(self, key: str) -> bool:
         """
@@ -277,18 +386,15 @@ class ConfigStore:
         Returns:
             是否成功
         """
-        from src.storage import SystemSetting
-        from sqlalchemy import select
-        
         try:
             with self._get_session() as session:
-                existing = session.execute(
-                    select(SystemSetting).where(SystemSetting.key == key)
-                ).scalar_one_or_none()
+                # 直接执行 DELETE，无需先加载 ORM 对象
+                result = session.execute(
+                    delete(SystemSetting).where(SystemSetting.key == key)
+                )
+                session.commit()
                 
-                if existing:
-                    session.delete(existing)
-                    session.commit()
+                if result.rowcount:
                     logger.debug(f"配置 {key} 已删除")
                 
                 return True
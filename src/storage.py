@@ -20,6 +20,7 @@ from pathlib import Path
 import pandas as pd
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     String,
     Float,
@@ -180,6 +181,14 @@ class DatabaseManager:
     
     _instance: Optional['DatabaseManager'] = None
     
+    # 每个新连接执行一次的 SQLite PRAGMA
+    SQLITE_PRAGMAS = (
+        'PRAGMA journal_mode=WAL',      # 读写互不阻塞
+        'PRAGMA synchronous=NORMAL',    # WAL 模式下安全，避免每次提交 fsync
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-65536',     # 64MB 页缓存
+    )
+    
     def __new__(cls, *args, **kwargs):
         """单例模式实现"""
         if cls._instance is None:
@@ -208,6 +217,10 @@ class DatabaseManager:
             pool_pre_ping=True,  # 连接健康检查
         )
         
+        # SQLite 连接调优（WAL 模式，减少每次提交的 fsync 开销）
+        if self._engine.dialect.name == 'sqlite':
+            event.listen(self._engine, 'connect', DatabaseManager._set_sqlite_pragmas)
+        
         # 创建 Session 工厂
         self._SessionLocal = sessionmaker(
             bind=self._engine,
@@ -238,6 +251,22 @@ class DatabaseManager:
             cls._instance._engine.dispose()
             cls._instance = None
 
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_conn, connection_record) -> None:
+        """
+        SQLite 连接初始化钩子（engine connect 事件）
+
+        Args:
+            dbapi_conn: 底层 DBAPI 连接
+            connection_record: 连接池记录（未使用）
+        """
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in DatabaseManager.SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
     @classmethod
     def _cleanup_engine(cls, engine) -> None:
         """
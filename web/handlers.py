@@ -16,17 +16,24 @@ Web 处理器层 - 请求处理
 
 from __future__ import annotations
 
+import html
 import json
 import re
 import logging
 from http import HTTPStatus
 from datetime import datetime
-from typing import Dict, Any, TYPE_CHECKING
+from typing import Dict, Any, Optional, TYPE_CHECKING
 
 from web.services import get_config_service, get_analysis_service
 from web.templates import render_config_page
 from src.enums import ReportType
 
+try:
+    import orjson
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
 if TYPE_CHECKING:
     from http.server import BaseHTTPRequestHandler
 
@@ -44,17 +51,21 @@ class Response:
         self,
         body: bytes,
         status: HTTPStatus = HTTPStatus.OK,
-        content_type: str = "text/html; charset=utf-8"
+        content_type: str = "text/html; charset=utf-8",
+        headers: Optional[Dict[str, str]] = None
     ):
         self.body = body
         self.status = status
         self.content_type = content_type
+        self.headers = headers or {}
     
     def send(self, handler: 'BaseHTTPRequestHandler') -> None:
         """发送响应到客户端"""
         handler.send_response(self.status)
         handler.send_header("Content-Type", self.content_type)
         handler.send_header("Content-Length", str(len(self.body)))
+        for name, value in self.headers.items():
+            handler.send_header(name, value)
         handler.end_headers()
         handler.wfile.write(self.body)
 
@@ -67,12 +78,22 @@ class JsonResponse(Response):
         data: Dict[str, Any],
         status: HTTPStatus = HTTPStatus.OK
     ):
-        body = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        body = self._dumps(data)
         super().__init__(
             body=body,
             status=status,
             content_type="application/json; charset=utf-8"
         )
+    
+    @staticmethod
+    def _dumps(data: Dict[str, Any]) -> bytes:
+        """序列化为 UTF-8 JSON（优先使用 orjson，不可用或不支持的类型回退标准库）"""
+        if orjson_available:
+            try:
+                return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                pass
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
 
 
 class HtmlResponse(Response):
@@ -90,6 +111,23 @@ class HtmlResponse(Response):
         )
 
 
+class RedirectResponse(Response):
+    """重定向响应封装（默认 303 See Other，POST 后跳转为 GET）"""
+    
+    def __init__(
+        self,
+        location: str,
+        status: HTTPStatus = HTTPStatus.SEE_OTHER
+    ):
+        body = f'<a href="{html.escape(location)}">{html.escape(location)}</a>'.encode("utf-8")
+        super().__init__(
+            body=body,
+            status=status,
+            content_type="text/html; charset=utf-8",
+            headers={"Location": location}
+        )
+
+
 # ============================================================
 # 页面处理器
 # ============================================================
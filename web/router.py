@@ -46,12 +46,15 @@ class Route:
         path: str,
         method: str,
         handler: RouteHandler,
-        description: str = ""
+        description: str = "",
+        with_headers: bool = False
     ):
         self.path = path
         self.method = method.upper()
         self.handler = handler
         self.description = description
+        # 为 True 时处理器额外接收请求头: (query_params, headers) -> Response
+        self.with_headers = with_headers
 
 
 class Router:
@@ -72,7 +75,8 @@ class Router:
         path: str,
         method: str,
         handler: RouteHandler,
-        description: str = ""
+        description: str = "",
+        with_headers: bool = False
     ) -> None:
         """
         注册路由
@@ -82,12 +86,13 @@ class Router:
             method: HTTP 方法 (GET, POST, etc.)
             handler: 处理函数
             description: 路由描述
+            with_headers: 是否向处理器传入请求头
         """
         method = method.upper()
         if path not in self._routes:
             self._routes[path] = {}
         
-        self._routes[path][method] = Route(path, method, handler, description)
+        self._routes[path][method] = Route(path, method, handler, description, with_headers)
         logger.debug(f"[Router] 注册路由: {method} {path}")
     
     def get(self, path: str, description: str = "") -> Callable:
@@ -154,7 +159,11 @@ class Router:
         
         try:
             # 调用处理器
-            response = route.handler(query)
+            if route.with_headers:
+                headers = {key: value for key, value in request_handler.headers.items()}
+                response = route.handler(query, headers)
+            else:
+                response = route.handler(query)
             response.send(request_handler)
             
         except Exception as e:
@@ -302,8 +311,9 @@ def create_default_router() -> Router:
     # === 设置页面路由 ===
     router.register(
         "/settings", "GET",
-        lambda q: settings_handler.handle_settings_page(q),
-        "设置页面"
+        lambda q, headers: settings_handler.handle_settings_page(q, headers),
+        "设置页面",
+        with_headers=True
     )
     
     router.register(
@@ -13,16 +13,23 @@ Web 设置页面处理器
 from __future__ import annotations
 
 import json
+import uuid
+import zlib
 import logging
+import threading
+from datetime import datetime
 from http import HTTPStatus
 from typing import Dict, Any
 from urllib.parse import parse_qs
 
-from web.handlers import Response, HtmlResponse, JsonResponse
-from web.settings_service import get_settings_service
+from web.handlers import Response, HtmlResponse, JsonResponse, RedirectResponse
+from web.settings_service import API_KEY_FIELDS, get_settings_service
 
 logger = logging.getLogger(__name__)
 
+# 进程标识，避免重启后版本号归零导致 ETag 误匹配
+_BOOT_ID = uuid.uuid4().hex[:8]
+
 
 class SettingsHandler:
     """设置页面处理器"""
@@ -30,12 +37,19 @@ class SettingsHandler:
     def __init__(self):
         self.service = get_settings_service()
     
-    def handle_settings_page(self, query: Dict[str, list] = None) -> Response:
+    def handle_settings_page(self, query: Dict[str, list] = None, headers: Dict[str, str] = None) -> Response:
         """
         GET /settings - 渲染设置页面
+        
+        设置未变化且客户端携带匹配的 If-None-Match 时返回 304
         """
         from web.templates import render_settings_page
         
+        etag = self._settings_etag(query)
+        cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self._etag_matches(headers, etag):
+            return Response(b'', status=HTTPStatus.NOT_MODIFIED, headers=cache_headers)
+        
         settings = self.service.get_all_settings()
         
         # 检查是否有消息参数
@@ -50,25 +64,33 @@ class SettingsHandler:
                 message_type = type_list[0]
         
         body = render_settings_page(settings, message, message_type)
-        return HtmlResponse(body)
+        response = HtmlResponse(body)
+        response.headers.update(cache_headers)
+        return response
+    
+    def _settings_etag(self, query: Dict[str, list] = None) -> str:
+        """
+        生成设置页面的 ETag
+        
+        由进程标识、设置版本号、当前分钟（下次执行时间随时间变化）和查询参数组成
+        """
+        query_hash = zlib.crc32(repr(sorted((query or {}).items())).encode('utf-8'))
+        minute = datetime.now().strftime('%Y%m%d%H%M')
+        return f'W/"{_BOOT_ID}-{self.service.settings_version}-{minute}-{query_hash:08x}"'
+    
+    @staticmethod
+    def _etag_matches(headers: Dict[str, str] = None, etag: str = '') -> bool:
+        """检查请求头 If-None-Match 是否包含指定 ETag（头名称不区分大小写）"""
+        for name, value in (headers or {}).items():
+            if name.lower() == 'if-none-match':
+                return etag in (tag.strip() for tag in value.split(','))
+        return False
     
     def handle_save_api_keys(self, form_data: Dict[str, list]) -> Response:
         """
         POST /settings/api-keys - 保存 API Keys
         """
-        keys = {
-            'gemini_api_key': self._get_form_value(form_data, 'gemini_api_key'),
-            'gemini_model': self._get_form_value(form_data, 'gemini_model'),
-            'gemini_model_fallback': self._get_form_value(form_data, 'gemini_model_fallback'),
-            'tushare_token': self._get_form_value(form_data, 'tushare_token'),
-            'tavily_api_keys': self._get_form_value(form_data, 'tavily_api_keys'),
-            'serpapi_keys': self._get_form_value(form_data, 'serpapi_keys'),
-            'openai_api_key': self._get_form_value(form_data, 'openai_api_key'),
-            'openai_base_url': self._get_form_value(form_data, 'openai_base_url'),
-            'openai_model': self._get_form_value(form_data, 'openai_model'),
-            'deepseek_api_key': self._get_form_value(form_data, 'deepseek_api_key'),
-            'zhipu_api_key': self._get_form_value(form_data, 'zhipu_api_key'),
-        }
+        keys = {key: (form_data.get(key) or [''])[0].strip() for key in API_KEY_FIELDS}
         
         success, message = self.service.save_api_keys(keys)
         
@@ -125,7 +147,7 @@ class SettingsHandler:
     
     def _get_form_value(self, form_data: Dict[str, list], key: str, default: str = '') -> str:
         """从表单数据获取值"""
-        values = form_data.get(key, [])
+        values = form_data.get(key)
         return values[0] if values else default
     
     def _redirect_with_message(self, path: str, message: str, msg_type: str = 'success') -> Response:
@@ -134,28 +156,19 @@ class SettingsHandler:
         
         redirect_url = f"{path}?msg={quote(message)}&type={msg_type}"
         
-        # 返回 HTML 重定向
-        html = f'''<!DOCTYPE html>
-<html>
-<head>
-    <meta http-equiv="refresh" content="0;url={redirect_url}">
-</head>
-<body>
-    <p>正在跳转...</p>
-    <script>window.location.href = "{redirect_url}";</script>
-</body>
-</html>'''
-        
-        return HtmlResponse(html.encode('utf-8'))
+        return RedirectResponse(redirect_url)
 
 
 # 单例实例
 _settings_handler: SettingsHandler | None = None
+_settings_handler_lock = threading.Lock()
 
 
 def get_settings_handler() -> SettingsHandler:
     """获取设置处理器实例"""
     global _settings_handler
     if _settings_handler is None:
-        _settings_handler = SettingsHandler()
+        with _settings_handler_lock:
+            if _settings_handler is None:
+                _settings_handler = SettingsHandler()
     return _settings_handler
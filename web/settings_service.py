@@ -14,12 +14,53 @@ Web 设置服务层 - 设置业务逻辑
 from __future__ import annotations
 
 import re
+import time
 import logging
+import threading
 from typing import Dict, Any, Optional, Tuple, List
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# .env 中的 STOCK_LIST 行
+_STOCK_LINE_RE = re.compile(r'^(\s*STOCK_LIST\s*=\s*).*$', re.MULTILINE)
+
+# 股票代码：A股/指数 6 位数字 | 港股 hk + 5 位数字 | 美股 1-5 个字母（已转小写）
+_STOCK_CODE_RE = re.compile(r'\d{6}|hk\d{5}|[a-z]{1,5}')
+
+# 定时任务时间：逗号分隔的 HH:MM 列表
+_SCHEDULE_RE = re.compile(r'\s*\d{1,2}:\d{2}\s*(?:,\s*\d{1,2}:\d{2}\s*)*')
+
+# 视为 True 的配置字符串
+_TRUE_SET = frozenset({'true', 'True', 'TRUE', '1', 'on', 'yes'})
+
+# API Keys 表单字段（均归入 api_keys 分类）
+API_KEY_FIELDS = (
+    'gemini_api_key',
+    'tushare_token',
+    'tavily_api_keys',
+    'serpapi_keys',
+    'openai_api_key',
+    'openai_base_url',
+    'openai_model',
+    'gemini_model',
+    'gemini_model_fallback',
+    'deepseek_api_key',
+    'zhipu_api_key',
+)
+
+# 敏感字段：(配置键, Config 中的回退属性名，None 表示无回退)
+_SENSITIVE_FIELDS = (
+    ('gemini_api_key', 'gemini_api_key'),
+    ('tushare_token', 'tushare_token'),
+    ('tavily_api_keys', 'tavily_api_keys'),
+    ('serpapi_keys', 'serpapi_keys'),
+    ('openai_api_key', 'openai_api_key'),
+    ('deepseek_api_key', None),
+    ('zhipu_api_key', None),
+    ('email_password', 'email_password'),
+)
+
 
 class SettingsService:
     """
@@ -29,12 +70,31 @@ class SettingsService:
     """
     
     _instance: Optional['SettingsService'] = None
+    _lock = threading.Lock()
+    
+    # get_all_settings 结果缓存有效期（秒）
+    SETTINGS_CACHE_TTL = 2.0
+    
+    def __init__(self):
+        self._settings_cache: Optional[Dict[str, Any]] = None
+        self._settings_cache_ts = 0.0
+        self._settings_cache_version = 0
+        self._settings_cache_lock = threading.Lock()
+        # 设置版本号，每次保存后递增（用于页面 ETag）
+        self._settings_version = 0
+    
+    @property
+    def settings_version(self) -> int:
+        """当前设置版本号"""
+        return self._settings_version
     
     @classmethod
     def get_instance(cls) -> 'SettingsService':
-        """获取单例实例"""
+        """获取单例实例（双重检查锁定，线程安全）"""
         if cls._instance is None:
-            cls._instance = cls()
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
         return cls._instance
     
     def get_all_settings(self) -> Dict[str, Any]:
@@ -44,6 +104,12 @@ class SettingsService:
         Returns:
             包含所有配置的字典，敏感值已掩码
         """
+        with self._settings_cache_lock:
+            if (self._settings_cache is not None
+                    and time.monotonic() - self._settings_cache_ts < self.SETTINGS_CACHE_TTL):
+                return dict(self._settings_cache)
+            version = self._settings_cache_version
+        
         from src.config_store import get_config_store
         from src.config import get_config
         
@@ -53,39 +119,19 @@ class SettingsService:
         # 从数据库获取配置
         db_configs = store.get_all()
         
-        # 构建设置字典
+        # 构建设置字典（敏感字段见下方）
         settings = {
             # API Keys
-            'gemini_api_key': self._get_masked_value(db_configs, 'gemini_api_key', config.gemini_api_key),
-            'gemini_api_key_raw': db_configs.get('gemini_api_key') or config.gemini_api_key or '',
             'gemini_model': db_configs.get('gemini_model') or config.gemini_model,
             'gemini_model_fallback': db_configs.get('gemini_model_fallback') or config.gemini_model_fallback,
-            'tushare_token': self._get_masked_value(db_configs, 'tushare_token', config.tushare_token),
-            'tushare_token_raw': db_configs.get('tushare_token') or config.tushare_token or '',
-            'tavily_api_keys': self._get_masked_value(db_configs, 'tavily_api_keys', ','.join(config.tavily_api_keys)),
-            'tavily_api_keys_raw': db_configs.get('tavily_api_keys') or ','.join(config.tavily_api_keys),
-            'serpapi_keys': self._get_masked_value(db_configs, 'serpapi_keys', ','.join(config.serpapi_keys)),
-            'serpapi_keys_raw': db_configs.get('serpapi_keys') or ','.join(config.serpapi_keys),
-            'openai_api_key': self._get_masked_value(db_configs, 'openai_api_key', config.openai_api_key),
-            'openai_api_key_raw': db_configs.get('openai_api_key') or config.openai_api_key or '',
             'openai_base_url': db_configs.get('openai_base_url') or config.openai_base_url or '',
             'openai_model': db_configs.get('openai_model') or config.openai_model,
             
-            # DeepSeek
-            'deepseek_api_key': self._get_masked_value(db_configs, 'deepseek_api_key', None),
-            'deepseek_api_key_raw': db_configs.get('deepseek_api_key') or '',
-            
-            # 智谱 AI
-            'zhipu_api_key': self._get_masked_value(db_configs, 'zhipu_api_key', None),
-            'zhipu_api_key_raw': db_configs.get('zhipu_api_key') or '',
-            
             # 自选股
             'stock_list': db_configs.get('stock_list') or ','.join(config.stock_list),
             
             # 邮件配置
             'email_sender': db_configs.get('email_sender') or config.email_sender or '',
-            'email_password': self._get_masked_value(db_configs, 'email_password', config.email_password),
-            'email_password_raw': db_configs.get('email_password') or config.email_password or '',
             'email_receivers': db_configs.get('email_receivers') or ','.join(config.email_receivers),
             
             # 定时任务
@@ -94,24 +140,39 @@ class SettingsService:
             'market_review_enabled': self._parse_bool(db_configs.get('market_review_enabled'), config.market_review_enabled),
         }
         
+        # 敏感字段：一次取值，同时生成掩码值和原始值（{key}_raw）
+        for key, attr in _SENSITIVE_FIELDS:
+            fallback = getattr(config, attr, None) if attr else None
+            if isinstance(fallback, list):
+                fallback = ','.join(fallback)
+            raw = db_configs.get(key) or fallback or ''
+            settings[key] = self.mask_sensitive_value(raw)
+            settings[f'{key}_raw'] = raw
+        
         # 计算下次执行时间
         settings['next_run_time'] = self._get_next_run_time(
             settings['schedule_enabled'],
             settings['schedule_time']
         )
         
-        return settings
+        # 计算期间若有保存操作则不回填缓存
+        with self._settings_cache_lock:
+            if version == self._settings_cache_version:
+                self._settings_cache = settings
+                self._settings_cache_ts = time.monotonic()
+        
+        return dict(settings)
     
-    def _get_masked_value(self, db_configs: Dict, key: str, fallback: Optional[str]) -> str:
-        """获取掩码后的值"""
-        value = db_configs.get(key) or fallback or ''
-        return self.mask_sensitive_value(value)
+    def _invalidate_settings_cache(self) -> None:
+        """清除设置缓存（保存配置后调用）"""
+        with self._settings_cache_lock:
+            self._settings_cache = None
+            self._settings_cache_version += 1
+            self._settings_version += 1
     
     def _parse_bool(self, value: Optional[str], default: bool) -> bool:
         """解析布尔值"""
-        if value is None:
-            return default
-        return value.lower() == 'true'
+        return default if value is None else value in _TRUE_SET
     
     def _get_next_run_time(self, enabled: bool, schedule_time: str) -> str:
         """计算下次执行时间"""
@@ -158,25 +219,14 @@ class SettingsService:
         store = get_config_store()
         
         try:
-            # 保存各个 API Key
-            key_mappings = {
-                'gemini_api_key': 'api_keys',
-                'tushare_token': 'api_keys',
-                'tavily_api_keys': 'api_keys',
-                'serpapi_keys': 'api_keys',
-                'openai_api_key': 'api_keys',
-                'openai_base_url': 'api_keys',
-                'openai_model': 'api_keys',
-                'gemini_model': 'api_keys',
-                'gemini_model_fallback': 'api_keys',
-                'deepseek_api_key': 'api_keys',
-                'zhipu_api_key': 'api_keys',
+            # 单个事务批量保存所有 API Key
+            batch = {
+                key: (keys[key] or '').strip()
+                for key in API_KEY_FIELDS
+                if key in keys
             }
-            
-            for key, category in key_mappings.items():
-                if key in keys:
-                    value = keys[key].strip() if keys[key] else ''
-                    store.set(key, value, category)
+            if not store.set_batch(batch, 'api_keys'):
+                return False, "保存失败: 数据库写入错误"
             
             # 刷新配置
             from src.config import get_config
@@ -188,6 +238,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"保存 API Keys 失败: {e}")
             return False, f"保存失败: {str(e)}"
+        finally:
+            self._invalidate_settings_cache()
     
     def save_stock_list(self, stocks: str) -> Tuple[bool, str]:
         """
@@ -207,13 +259,7 @@ class SettingsService:
         codes = [c.strip() for c in stocks.replace('\n', ',').split(',') if c.strip()]
         
         # 验证格式
-        invalid_codes = []
-        valid_codes = []
-        for code in codes:
-            if self.validate_stock_code(code):
-                valid_codes.append(code)
-            else:
-                invalid_codes.append(code)
+        valid_codes, invalid_codes = self.validate_stock_codes(codes)
         
         if invalid_codes:
             return False, f"无效的股票代码: {', '.join(invalid_codes)}"
@@ -238,6 +284,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"保存自选股列表失败: {e}")
             return False, f"保存失败: {str(e)}"
+        finally:
+            self._invalidate_settings_cache()
     
     def _update_env_stock_list(self, stock_list: str) -> None:
         """更新 .env 文件中的 STOCK_LIST"""
@@ -250,10 +298,9 @@ class SettingsService:
             content = env_path.read_text(encoding='utf-8')
             
             # 替换 STOCK_LIST 行
-            pattern = r'^(\s*STOCK_LIST\s*=\s*).*$'
             replacement = f'STOCK_LIST={stock_list}'
             
-            new_content, count = re.subn(pattern, replacement, content, flags=re.MULTILINE)
+            new_content, count = _STOCK_LINE_RE.subn(replacement, content)
             
             if count == 0:
                 # 如果没有找到，添加到文件末尾
@@ -261,6 +308,10 @@ class SettingsService:
                     new_content += '\n'
                 new_content += f'STOCK_LIST={stock_list}\n'
             
+            # 内容未变化时跳过写入
+            if new_content == content:
+                return
+            
             env_path.write_text(new_content, encoding='utf-8')
             
         except Exception as e:
@@ -295,6 +346,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"保存邮件配置失败: {e}")
             return False, f"保存失败: {str(e)}"
+        finally:
+            self._invalidate_settings_cache()
     
     def save_schedule_config(self, config: Dict[str, str]) -> Tuple[bool, str]:
         """
@@ -313,11 +366,8 @@ class SettingsService:
         try:
             # 验证时间格式
             schedule_time = config.get('schedule_time', '').strip()
-            if schedule_time:
-                times = [t.strip() for t in schedule_time.split(',')]
-                for t in times:
-                    if not re.match(r'^\d{1,2}:\d{2}$', t):
-                        return False, f"时间格式错误: {t}，请使用 HH:MM 格式"
+            if schedule_time and not _SCHEDULE_RE.fullmatch(schedule_time):
+                return False, f"时间格式错误: {schedule_time}，请使用 HH:MM 格式"
             
             store.set('schedule_enabled', config.get('schedule_enabled', 'false'), 'schedule')
             store.set('schedule_time', schedule_time, 'schedule')
@@ -333,6 +383,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"保存定时任务配置失败: {e}")
             return False, f"保存失败: {str(e)}"
+        finally:
+            self._invalidate_settings_cache()
     
     def test_email_send(self) -> Tuple[bool, str]:
         """
@@ -414,21 +466,24 @@ class SettingsService:
         Returns:
             是否有效
         """
-        code = code.strip().lower()
-        
-        # A股/指数：6位数字
-        if re.match(r'^\d{6}$', code):
-            return True
-        
-        # 港股：hk + 5位数字
-        if re.match(r'^hk\d{5}$', code):
-            return True
-        
-        # 美股：1-5个字母
-        if re.match(r'^[a-zA-Z]{1,5}$', code):
-            return True
+        return _STOCK_CODE_RE.fullmatch(code.strip().lower()) is not None
+    
+    @staticmethod
+    def validate_stock_codes(codes: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        批量验证股票代码格式
         
-        return False
+        Args:
+            codes: 股票代码列表
+            
+        Returns:
+            (有效代码列表, 无效代码列表)，保持原始顺序
+        """
+        valid, invalid = [], []
+        match = _STOCK_CODE_RE.fullmatch
+        for code in codes:
+            (valid if match(code.strip().lower()) else invalid).append(code)
+        return valid, invalid
 
 
 # 便捷函数